@@ -2,6 +2,7 @@
 config.py - .envから設定を読み込み、Configデータクラスに格納する。
 """
 
+import functools
 import os
 from dataclasses import dataclass
 from pathlib import Path
@@ -9,7 +10,10 @@ from typing import Optional
 
 from dotenv import load_dotenv
 
-load_dotenv()
+# 子プロセスで再インポートされた場合は .env を再パースしない (環境変数は親から引き継がれる)
+if not os.environ.get("_ENV_LOADED"):
+    load_dotenv()
+    os.environ["_ENV_LOADED"] = "1"
 
 
 @dataclass
@@ -38,34 +42,46 @@ class Config:
     email_to: list[str]
 
     @classmethod
+    @functools.lru_cache(maxsize=1)
     def from_env(cls) -> "Config":
-        search_url = os.environ.get("SUUMO_SEARCH_URL", "").strip()
+        """
+        環境変数から設定を読み込む。結果はキャッシュされるので、呼び出し側で書き換えないこと。
+        (上書きが必要な場合は dataclasses.replace を使う)
+        """
+        env = os.environ.copy()
+        search_url = env.get("SUUMO_SEARCH_URL", "").strip()
         if not search_url:
             raise ValueError(
                 "SUUMO_SEARCH_URL が設定されていません。.env ファイルを確認してください。"
             )
 
-        email_to_raw = os.environ.get("EMAIL_TO", "")
+        email_to_raw = env.get("EMAIL_TO", "")
         email_to = [e.strip() for e in email_to_raw.split(",") if e.strip()]
 
         return cls(
             search_url=search_url,
-            db_path=Path(os.environ.get("DB_PATH", "data/suumo.db")),
-            request_delay=float(os.environ.get("REQUEST_DELAY_SECONDS", "3.0")),
-            max_pages=int(os.environ.get("MAX_PAGES", "10")),
-            log_level=os.environ.get("LOG_LEVEL", "INFO").upper(),
-            line_channel_access_token=os.environ.get("LINE_CHANNEL_ACCESS_TOKEN") or None,
-            line_user_id=os.environ.get("LINE_USER_ID") or None,
-            slack_webhook_url=os.environ.get("SLACK_WEBHOOK_URL") or None,
-            email_enabled=os.environ.get("EMAIL_ENABLED", "false").lower() == "true",
-            smtp_host=os.environ.get("SMTP_HOST", "smtp.gmail.com"),
-            smtp_port=int(os.environ.get("SMTP_PORT", "587")),
-            smtp_username=os.environ.get("SMTP_USERNAME", ""),
-            smtp_password=os.environ.get("SMTP_PASSWORD", ""),
-            email_from=os.environ.get("EMAIL_FROM", ""),
+            db_path=Path(env.get("DB_PATH", "data/suumo.db")),
+            request_delay=float(env.get("REQUEST_DELAY_SECONDS", "3.0")),
+            max_pages=int(env.get("MAX_PAGES", "10")),
+            log_level=env.get("LOG_LEVEL", "INFO").upper(),
+            line_channel_access_token=env.get("LINE_CHANNEL_ACCESS_TOKEN") or None,
+            line_user_id=env.get("LINE_USER_ID") or None,
+            slack_webhook_url=env.get("SLACK_WEBHOOK_URL") or None,
+            email_enabled=env.get("EMAIL_ENABLED", "false").lower() == "true",
+            smtp_host=env.get("SMTP_HOST", "smtp.gmail.com"),
+            smtp_port=int(env.get("SMTP_PORT", "587")),
+            smtp_username=env.get("SMTP_USERNAME", ""),
+            smtp_password=env.get("SMTP_PASSWORD", ""),
+            email_from=env.get("EMAIL_FROM", ""),
             email_to=email_to,
         )
 
+    @classmethod
+    def reload(cls) -> "Config":
+        """キャッシュを破棄して環境変数から設定を読み直す。"""
+        cls.from_env.cache_clear()
+        return cls.from_env()
+
     def validate(self) -> None:
         line_ok = self.line_channel_access_token and self.line_user_id
         slack_ok = self.slack_webhook_url
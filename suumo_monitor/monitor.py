@@ -7,7 +7,11 @@ monitor.py - メインオーケストレーター。スクレイプ → 差分
 """
 
 import argparse
+import atexit
+import dataclasses
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
 from typing import Optional
@@ -18,16 +22,53 @@ from .scraper import SuumoScraper
 from .storage import ListingStorage
 
 
+LOG_BUFFER_SIZE = 64 * 1024
+
+
+class _BufferedFileHandler(logging.FileHandler):
+    """
+    レコードごとのflushを行わず、64KB単位でまとめて書き込むFileHandler。
+    バッファは close (終了時の logging.shutdown) で書き出される。
+    """
+
+    def _open(self):
+        return open(
+            self.baseFilename,
+            self.mode,
+            buffering=LOG_BUFFER_SIZE,
+            encoding=self.encoding,
+            errors=self.errors,
+        )
+
+    def flush(self) -> None:
+        pass  # StreamHandler.emit が毎回呼ぶflushを無効化する
+
+
 def setup_logging(level: str, log_file: Path) -> None:
+    """
+    ログの書き込みをバックグラウンドスレッドに任せる。
+    各ロガーはキューに積むだけで、stdout・ファイルへの出力は QueueListener が行う。
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return  # 設定済み (basicConfig と同様に2回目以降は何もしない)
+
     log_file.parent.mkdir(parents=True, exist_ok=True)
-    logging.basicConfig(
-        level=getattr(logging, level, logging.INFO),
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler(str(log_file), encoding="utf-8"),
-        ],
-    )
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    handlers: list[logging.Handler] = [
+        logging.StreamHandler(sys.stdout),
+        _BufferedFileHandler(str(log_file), encoding="utf-8"),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root.setLevel(getattr(logging, level, logging.INFO))
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
 
 
 def build_notifier(cfg: Config) -> Notifier:
@@ -53,7 +94,7 @@ def build_notifier(cfg: Config) -> Notifier:
 def run(dry_run: bool = False, search_url: Optional[str] = None) -> None:
     cfg = Config.from_env()
     if search_url:
-        cfg.search_url = search_url
+        cfg = dataclasses.replace(cfg, search_url=search_url)
     cfg.validate()
 
     log_file = cfg.db_path.parent / "monitor.log"
@@ -105,8 +146,7 @@ def run(dry_run: bool = False, search_url: Optional[str] = None) -> None:
                 # 3. 通知送信
                 notifier.notify(new_listings)
                 # 4. DBに保存して通知済みマーク
-                storage.save_listings(new_listings)
-                storage.mark_notified([l.listing_id for l in new_listings])
+                storage.save_listings(new_listings, notified=True)
             else:
                 logger.info("[DRY RUN] 検出された新着物件:")
                 for l in new_listings:
@@ -125,7 +165,9 @@ def run(dry_run: bool = False, search_url: Optional[str] = None) -> None:
             except Exception:
                 pass
     finally:
+        notifier.close()
         storage.log_run(listings_found, new_count, error=error_msg)
+        storage.close()
         logger.info("SUUMO Monitor 終了")
         logger.info("=" * 50)
 
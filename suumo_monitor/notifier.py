@@ -2,21 +2,44 @@
 notifier.py - LINE Messaging API・Slack Incoming Webhook・SMTPメールによる通知。
 """
 
-import json
+import atexit
 import logging
 import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.message import EmailMessage
 from typing import Optional
 
-import requests
+import httpx
 
 from .scraper import Listing
 
+try:
+    import orjson
+
+    def _json_bytes(obj) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:  # orjson が無い環境では標準ライブラリで代替する
+    import json
+
+    def _json_bytes(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
 logger = logging.getLogger(__name__)
 
 LINE_MESSAGING_API_URL = "https://api.line.me/v2/bot/message/push"
 LINE_MAX_MSG_LEN = 5000  # LINE Messaging APIの1メッセージあたりの上限
+LINE_MAX_MESSAGES_PER_PUSH = 5  # 1回のプッシュで送れるメッセージ数の上限
+
+# LINE・Slackで共有するHTTPクライアント。接続を使い回してTLSハンドシェイクを省く
+_http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=10),
+    timeout=15,
+)
+atexit.register(_http_client.close)
+# httpx はリクエストごとにURL全体をINFOで出力するため、秘密情報であるSlackのWebhook URLが
+# ログに残らないようWARNING以上に絞る
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
 class LineNotifier:
@@ -36,33 +59,46 @@ class LineNotifier:
         if not user_id:
             raise ValueError("LINE_USER_ID が設定されていません。")
         self.user_id = user_id
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             "Authorization": f"Bearer {channel_access_token}",
             "Content-Type": "application/json",
-        })
+        }
 
     def send(self, message: str) -> bool:
         """テキストメッセージを送信する。成功時はTrue。"""
-        if len(message) > LINE_MAX_MSG_LEN:
-            message = message[: LINE_MAX_MSG_LEN - 3] + "..."
+        return self.send_messages([message])
 
-        payload = {
-            "to": self.user_id,
-            "messages": [{"type": "text", "text": message}],
-        }
-        try:
-            resp = self.session.post(
-                LINE_MESSAGING_API_URL,
-                data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
-                timeout=15,
-            )
-            resp.raise_for_status()
-            logger.info("LINE通知を送信しました。")
-            return True
-        except requests.exceptions.RequestException as e:
-            logger.error(f"LINE通知の送信に失敗しました: {e}")
-            return False
+    def send_messages(self, messages: list[str]) -> bool:
+        """
+        複数のテキストメッセージを送信する。全て成功時はTrue。
+        1回のプッシュに最大5件までまとめて、リクエスト回数を減らす。
+        """
+        success = True
+        for i in range(0, len(messages), LINE_MAX_MESSAGES_PER_PUSH):
+            batch = messages[i : i + LINE_MAX_MESSAGES_PER_PUSH]
+            payload = {
+                "to": self.user_id,
+                "messages": [{"type": "text", "text": self._truncate(m)} for m in batch],
+            }
+            try:
+                resp = _http_client.post(
+                    LINE_MESSAGING_API_URL,
+                    content=_json_bytes(payload),
+                    headers=self.headers,
+                )
+                resp.raise_for_status()
+                logger.info(f"LINE通知を送信しました ({len(batch)} メッセージ)。")
+            except httpx.HTTPError as e:
+                logger.error(f"LINE通知の送信に失敗しました: {e}")
+                success = False
+        return success
+
+    @staticmethod
+    def _truncate(message: str) -> str:
+        """1メッセージの文字数上限を超える場合は末尾を切り詰める。"""
+        if len(message) > LINE_MAX_MSG_LEN:
+            return message[: LINE_MAX_MSG_LEN - 3] + "..."
+        return message
 
     def send_new_listings(self, listings: list[Listing]) -> bool:
         """
@@ -72,22 +108,28 @@ class LineNotifier:
         if not listings:
             return True
 
+        # 文字列の += は毎回コピーが発生するので、部品をリストに溜めて文字数だけ数える
         header = f"【SUUMO新着】{len(listings)}件\n"
-        current_chunk = header
-        success = True
+        current_parts = [header]
+        current_len = len(header)
+        chunks: list[str] = []
 
         for l in listings:
             entry = f"{l.url}\n"
-            if len(current_chunk) + len(entry) > LINE_MAX_MSG_LEN:
-                success &= self.send(current_chunk)
-                current_chunk = entry
+            entry_len = len(entry)
+            if current_len + entry_len > LINE_MAX_MSG_LEN:
+                chunks.append("".join(current_parts))
+                current_parts = [entry]
+                current_len = entry_len
             else:
-                current_chunk += entry
+                current_parts.append(entry)
+                current_len += entry_len
 
+        current_chunk = "".join(current_parts)
         if current_chunk.strip():
-            success &= self.send(current_chunk)
+            chunks.append(current_chunk)
 
-        return success
+        return self.send_messages(chunks)
 
 
 class SlackNotifier:
@@ -109,15 +151,15 @@ class SlackNotifier:
     def send(self, text: str) -> bool:
         """テキストメッセージを送信する。mrkdwn記法が使える。"""
         try:
-            resp = requests.post(
+            resp = _http_client.post(
                 self.webhook_url,
-                json={"text": text},
-                timeout=15,
+                content=_json_bytes({"text": text}),
+                headers={"Content-Type": "application/json"},
             )
             resp.raise_for_status()
             logger.info("Slack通知を送信しました。")
             return True
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Slack通知の送信に失敗しました: {e}")
             return False
 
@@ -155,45 +197,69 @@ class EmailNotifier:
         self.password = password
         self.from_addr = from_addr
         self.to_addrs = to_addrs
+        self.session: Optional[smtplib.SMTP] = None
+
+    def _server(self) -> smtplib.SMTP:
+        """SMTP接続を初回のみ開いてログインし、以降は使い回す。"""
+        if self.session is None:
+            server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+            try:
+                server.starttls()
+                server.login(self.username, self.password)
+            except BaseException:
+                server.close()  # TLS・認証に失敗した接続を残さない
+                raise
+            self.session = server
+        return self.session
+
+    def close(self) -> None:
+        """SMTP接続を閉じる。"""
+        if self.session is not None:
+            try:
+                self.session.quit()
+            except smtplib.SMTPException:
+                pass
+            self.session = None
 
     def send_new_listings(self, listings: list[Listing]) -> bool:
         """新着物件のHTMLメールを送信する。"""
         if not listings:
             return True
 
-        subject = f"[SUUMO] {len(listings)}件の新着物件があります"
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
+        plain, html = self._build_bodies(listings)
+        msg = EmailMessage()
+        msg["Subject"] = f"[SUUMO] {len(listings)}件の新着物件があります"
         msg["From"] = self.from_addr
         msg["To"] = ", ".join(self.to_addrs)
-        msg.attach(MIMEText(self._build_plain(listings), "plain", "utf-8"))
-        msg.attach(MIMEText(self._build_html(listings), "html", "utf-8"))
+        # 8BITMIME非対応のリレーでも通るよう、旧MIMETextと同じくbase64で送る
+        msg.set_content(plain, cte="base64")
+        msg.add_alternative(html, subtype="html", cte="base64")
 
         try:
-            with smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30) as server:
-                server.starttls()
-                server.login(self.username, self.password)
-                server.sendmail(self.from_addr, self.to_addrs, msg.as_bytes())
+            self._server().sendmail(self.from_addr, self.to_addrs, msg.as_bytes())
             logger.info(f"メールを送信しました: {self.to_addrs}")
             return True
         except smtplib.SMTPException as e:
             logger.error(f"メール送信に失敗しました: {e}")
+            self.close()  # 次回は接続からやり直す
             return False
 
     @staticmethod
-    def _build_html(listings: list[Listing]) -> str:
-        links = "".join(f'<li><a href="{l.url}">{l.url}</a></li>' for l in listings)
-        return f"""
+    def _build_bodies(listings: list[Listing]) -> tuple[str, str]:
+        """物件一覧を1回走査して、(プレーンテキスト本文, HTML本文) を返す。"""
+        title = f"SUUMO 新着物件通知 ({len(listings)}件)"
+        plain_lines = [title, "=" * 40]
+        html_items = []
+        for l in listings:
+            plain_lines.append(l.url)
+            html_items.append(f'<li><a href="{l.url}">{l.url}</a></li>')
+
+        html = f"""
 <html><body>
-<h2>SUUMO 新着物件通知 ({len(listings)}件)</h2>
-<ul>{links}</ul>
+<h2>{title}</h2>
+<ul>{"".join(html_items)}</ul>
 </body></html>"""
-
-    @staticmethod
-    def _build_plain(listings: list[Listing]) -> str:
-        lines = [f"SUUMO 新着物件通知 ({len(listings)}件)", "=" * 40]
-        lines += [l.url for l in listings]
-        return "\n".join(lines)
+        return "\n".join(plain_lines), html
 
 
 class Notifier:
@@ -227,6 +293,11 @@ class Notifier:
         if self.email:
             self.email.send_new_listings(listings)
 
+    def close(self) -> None:
+        """保持している接続を閉じる。"""
+        if self.email:
+            self.email.close()
+
     def notify_error(self, message: str) -> None:
         """エラー発生時に通知する。"""
         error_text = f"[SUUMO Monitor エラー]\n{message}"
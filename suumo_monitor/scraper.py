@@ -2,15 +2,24 @@
 scraper.py - SUUMOの検索結果ページを取得し、物件情報を抽出する。
 """
 
+import asyncio
 import logging
+import os
 import re
-import time
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Optional
-from urllib.parse import parse_qs, urljoin, urlparse
+from typing import Optional, Union
+from urllib.parse import parse_qs, parse_qsl, urlencode, urljoin, urlparse, urlunparse
 
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # selectolax が無い環境では lxml + cssselect (lxml[cssselect]) で代替する
+    HTMLParser = None
+    import lxml.html
+    from lxml import etree
+    from lxml.cssselect import LxmlHTMLTranslator
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +41,37 @@ SELECTORS = {
     "next_page": "div.pagination.pagination-parts a[href]",
 }
 
+# これより小さいページはプロセス間のpickleコストの方が大きいため、プロセスプールを使わずにその場でパースする
+PROCESS_POOL_MIN_BYTES = 64 * 1024
+
+_JNC_RE = re.compile(r"jnc_\w+")
+_FLOOR_RE = re.compile(r"\d+階")
+
+# lxmlフォールバック用: SELECTORS をインポート時に1回だけXPathへ変換・コンパイルし、
+# カードごとのループではC実装のXPath評価のみを行う。
+# 起点要素自身にはマッチさせないよう descendant:: 軸で変換する。
+if HTMLParser is None:
+    _translator = LxmlHTMLTranslator()
+    _COMPILED_SELECTORS = {
+        key: etree.XPath(_translator.css_to_xpath(sel, prefix="descendant::"))
+        for key, sel in SELECTORS.items()
+    }
+    _TEXT_NODES = etree.XPath(".//text()")
+
+
+def _absolute_url(href: str) -> str:
+    """
+    SUUMO内のリンクを絶対URLに変換する。
+    ほとんどのリンクは "/chintai/..." 形式なので、urljoin (URLの再パース) を避けて文字列連結する。
+    """
+    if href.startswith(("http://", "https://")):
+        return href
+    if href.startswith("/") and not href.startswith("//"):
+        return BASE_URL + href
+    return urljoin(BASE_URL, href)
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Listing:
     """SUUMOの1ユニット分の物件情報"""
 
@@ -49,13 +87,35 @@ class Listing:
     unit_floor: str  # 部屋の階数 (例: "3階")
 
 
+def _parse_page(html: Union[str, bytes]) -> list[Listing]:
+    """1ページ分のHTMLをパースする。ProcessPoolExecutor から呼ぶためモジュールレベルに置く。"""
+    return SuumoScraper._parse_listings(SuumoScraper._make_tree(html))
+
+
+class _RateLimiter:
+    """リクエストの開始間隔を interval 秒以上に保つ簡易トークンバケット。"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_at = 0.0
+
+    async def wait(self) -> None:
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_at = loop.time() + self.interval
+
+
 class SuumoScraper:
     """
     SUUMOの検索結果ページを取得してパースするスクレイパー。
 
     - サーバーサイドレンダリングのHTML取得のみ (Selenium不要)
-    - ページネーションを自動追跡
-    - レートリミット対策として各ページ取得間にウェイトを挿入
+    - 1ページ目でページ数を調べ、2ページ目以降は並列に取得
+    - レートリミット対策として同時接続数とリクエスト間隔を制限
     """
 
     HEADERS = {
@@ -67,110 +127,225 @@ class SuumoScraper:
         "Accept-Language": "ja,en;q=0.9",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     }
+    CONCURRENCY = 2  # SUUMOへの同時接続数
 
     def __init__(self, request_delay: float = 3.0, timeout: int = 30, max_pages: int = 10):
-        self.session = requests.Session()
-        self.session.headers.update(self.HEADERS)
         self.request_delay = request_delay
         self.timeout = timeout
         self.max_pages = max_pages
 
     def fetch_all_listings(self, search_url: str) -> list[Listing]:
+        """fetch_all_listings_async の同期ラッパー。"""
+        return asyncio.run(self.fetch_all_listings_async(search_url))
+
+    async def fetch_all_listings_async(self, search_url: str) -> list[Listing]:
         """
         検索URLから全ページの物件一覧を取得して返す。
-        ページネーションを自動的に追跡する。
+        1ページ目のページネーションから総ページ数を調べ、残りのページを並列に取得する。
         """
-        all_listings: list[Listing] = []
-        url: Optional[str] = search_url
-        page_num = 1
-
-        while url and page_num <= self.max_pages:
-            logger.info(f"ページ {page_num} を取得中: {url}")
-            html = self._fetch_page(url)
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit_per_host=self.CONCURRENCY)
+        async with aiohttp.ClientSession(
+            headers=self.HEADERS,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        ) as session:
+            semaphore = asyncio.Semaphore(self.CONCURRENCY)
+            limiter = _RateLimiter(self.request_delay / self.CONCURRENCY)
+            # 結果の最終ページ。空ページが返ったら縮め、それより後のページは取得しない
+            end_page = self.max_pages
+
+            async def fetch(page_num: int, url: str) -> Optional[Union[str, bytes]]:
+                async with semaphore:
+                    if page_num > end_page:
+                        return None
+                    await limiter.wait()
+                    if page_num > end_page:
+                        return None  # 待っている間に手前のページで終端が分かった
+                    logger.info(f"ページ {page_num} を取得中: {url}")
+                    return await self._fetch_page(session, url)
+
+            html = await fetch(1, search_url)
             if not html:
+                logger.warning("ページ 1 の取得に失敗しました。スキップします。")
+                return []
+
+            first_listings, last_page, numbered = await loop.run_in_executor(
+                None, self._parse_first_page, html
+            )
+            all_listings = list(first_listings)
+            if not first_listings:
+                self._warn_no_listings(1)
+            logger.info(f"  → {len(first_listings)} 件取得 (累計: {len(all_listings)} 件)")
+            end_page = min(last_page, self.max_pages)
+            # パース済みページの listing_id。ページネーションのループ検出に使う
+            parsed_ids: dict[int, set[str]] = {1: {l.listing_id for l in first_listings}}
+
+            async def fetch_and_parse(page_num: int) -> Optional[list[Listing]]:
+                nonlocal end_page
+                html = await fetch(page_num, self._page_url(search_url, page_num))
+                if page_num > end_page:
+                    return []  # 手前のページで終端が分かったので取得をスキップした
+                if not html:
+                    return None
+                if len(html) < PROCESS_POOL_MIN_BYTES:
+                    page_listings = _parse_page(html)
+                else:
+                    # パースはCPUバウンドなので別プロセスで行い、他ページの取得と並行させる
+                    page_listings = await loop.run_in_executor(pool, _parse_page, html)
+                if not page_listings:
+                    # 空ページ = 結果の終端。ページ番号から見て想定外なら構造変更を疑う
+                    if numbered:
+                        self._warn_no_listings(page_num)
+                    end_page = min(end_page, page_num - 1)
+                    return page_listings
+                # 手前のページで取得済みの物件しか無ければページネーションがループしている
+                page_ids = {l.listing_id for l in page_listings}
+                earlier_ids = set().union(*(ids for n, ids in parsed_ids.items() if n < page_num))
+                if page_ids <= earlier_ids:
+                    logger.info(f"ページ {page_num} は取得済みの物件のみでした。ここで打ち切ります。")
+                    end_page = min(end_page, page_num - 1)
+                parsed_ids[page_num] = page_ids
+                return page_listings
+
+            page_nums = range(2, end_page + 1)
+            workers = min(os.cpu_count() or 1, self.max_pages)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pages = await asyncio.gather(*(fetch_and_parse(n) for n in page_nums))
+
+        # ページ順に結合する。取得失敗したページ以降は捨てる
+        seen_ids = {l.listing_id for l in first_listings}
+        for page_num, page_listings in zip(page_nums, pages):
+            if page_num > end_page:
+                break
+            if page_listings is None:
                 logger.warning(f"ページ {page_num} の取得に失敗しました。スキップします。")
                 break
-
-            soup = BeautifulSoup(html, "lxml")
-            page_listings = self._parse_listings(soup)
+            page_ids = {l.listing_id for l in page_listings}
+            if page_ids <= seen_ids:
+                # 後のページが先にパースされ、取得中にはループを検出できなかった場合
+                logger.info(f"ページ {page_num} は取得済みの物件のみでした。ここで打ち切ります。")
+                break
+            seen_ids |= page_ids
             all_listings.extend(page_listings)
-            logger.info(f"  → {len(page_listings)} 件取得 (累計: {len(all_listings)} 件)")
-
-            url = self._get_next_page_url(soup)
-            page_num += 1
-
-            if url:
-                time.sleep(self.request_delay)
+            logger.info(
+                f"  → ページ {page_num}: {len(page_listings)} 件取得 (累計: {len(all_listings)} 件)"
+            )
 
         return all_listings
 
-    def _fetch_page(self, url: str) -> Optional[str]:
+    @staticmethod
+    def _warn_no_listings(page_num: int) -> None:
+        # パースはワーカープロセスで行われることがあるため、警告はメインプロセス側で出す
+        logger.warning(
+            f"ページ {page_num} で物件が見つかりませんでした。"
+            "SUUMOのHTML構造が変わった可能性があります。"
+        )
+
+    async def _fetch_page(
+        self, session: aiohttp.ClientSession, url: str
+    ) -> Optional[Union[str, bytes]]:
         """1ページ分のHTMLを取得して返す。失敗時はNoneを返す。"""
         try:
-            resp = self.session.get(url, timeout=self.timeout)
-            resp.raise_for_status()
-            resp.encoding = resp.apparent_encoding
-            return resp.text
-        except requests.exceptions.HTTPError as e:
-            if e.response is not None and e.response.status_code == 429:
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                return await self._read_body(resp)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429:
                 logger.warning("レートリミット (429)。60秒待機してリトライします。")
-                time.sleep(60)
+                await asyncio.sleep(60)
                 try:
-                    resp = self.session.get(url, timeout=self.timeout)
-                    resp.raise_for_status()
-                    resp.encoding = resp.apparent_encoding
-                    return resp.text
-                except requests.exceptions.RequestException as e2:
+                    async with session.get(url) as resp:
+                        resp.raise_for_status()
+                        return await self._read_body(resp)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e2:
                     logger.error(f"リトライも失敗: {e2}")
                     return None
             logger.error(f"HTTPエラー ({url}): {e}")
             return None
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"ネットワークエラー ({url}): {e}")
             return None
 
-    def _parse_listings(self, soup: BeautifulSoup) -> list[Listing]:
+    @staticmethod
+    async def _read_body(resp: aiohttp.ClientResponse) -> Union[str, bytes]:
+        """
+        レスポンス本文を返す。ヘッダーのcharsetがUTF-8または未指定の場合はバイト列のまま返し、
+        文字コードの判定はパーサー (lexbor) に任せてPythonでのデコードを省く。
+        """
+        body = await resp.read()
+        charset = resp.charset
+        if charset and charset.lower() not in ("utf-8", "utf8"):
+            try:
+                return body.decode(charset, errors="replace")
+            except LookupError:
+                pass  # 未知のcharsetはパーサーの判定に任せる
+        return body
+
+    def _parse_first_page(self, html: Union[str, bytes]) -> tuple[list[Listing], int, bool]:
+        """
+        1ページ目をパースし、(物件一覧, 最終ページ番号, ページ番号が取得できたか) を返す。
+        ページ番号リンクが無く「次へ」だけがある場合は max_pages までを投機的に取得する。
+        """
+        tree = self._make_tree(html)
+        listings = self._parse_listings(tree)
+        page_nums = [
+            int(text)
+            for a in self._select(tree, "next_page")
+            if (text := self._node_text(a)).isdigit()
+        ]
+        if page_nums:
+            return listings, max(page_nums), True
+        if self._get_next_page_url(tree):
+            return listings, self.max_pages, False
+        return listings, 1, True
+
+    @staticmethod
+    def _page_url(search_url: str, page_num: int) -> str:
+        """検索URLの page パラメータを差し替えたURLを返す。"""
+        parts = urlparse(search_url)
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "page"]
+        query.append(("page", str(page_num)))
+        return urlunparse(parts._replace(query=urlencode(query)))
+
+    @classmethod
+    def _parse_listings(cls, tree) -> list[Listing]:
         """1ページ分のHTMLから全物件情報を抽出する。"""
         listings: list[Listing] = []
-        cards = soup.select(SELECTORS["listing_item"])
-
-        if not cards:
-            logger.warning(
-                "物件カードが見つかりませんでした。SUUMOのHTML構造が変わった可能性があります。"
-            )
+        cards = cls._select(tree, "listing_item")
 
         for card in cards:
-            building_name = self._text(card, SELECTORS["building_name"])
-            address = self._text(card, SELECTORS["address"])
-            station_access = self._text(card, SELECTORS["station_access"])
-            age_floors = self._text(card, SELECTORS["age_floors"])
+            building_name = cls._text(card, "building_name")
+            address = cls._text(card, "address")
+            station_access = cls._text(card, "station_access")
+            age_floors = cls._text(card, "age_floors")
 
-            unit_rows = card.select(SELECTORS["unit_rows"])
+            unit_rows = cls._select(card, "unit_rows")
             for row in unit_rows:
-                link_tag = row.select_one(SELECTORS["unit_link"])
-                if not link_tag or not link_tag.get("href"):
+                link_tag = cls._select_one(row, "unit_link")
+                href = cls._attr(link_tag, "href") if link_tag is not None else None
+                if not href:
                     continue
 
-                href = str(link_tag["href"])
-                listing_id = self._extract_listing_id(href)
+                listing_id = cls._extract_listing_id(href)
                 if not listing_id:
                     continue
 
                 # 行テキストから "X階" を抽出 (例: "3階", "1階")
-                row_text = row.get_text(" ", strip=True)
-                floor_match = re.search(r"\d+階", row_text)
+                row_text = cls._node_text(row, " ")
+                floor_match = _FLOOR_RE.search(row_text)
                 unit_floor = floor_match.group(0) if floor_match else ""
 
                 listings.append(
                     Listing(
                         listing_id=listing_id,
-                        url=urljoin(BASE_URL, href),
+                        url=_absolute_url(href),
                         building_name=building_name,
                         address=address,
                         station_access=station_access,
-                        rent=self._text(row, SELECTORS["unit_rent"]),
-                        layout=self._text(row, SELECTORS["unit_layout"]),
-                        area=self._text(row, SELECTORS["unit_area"]),
+                        rent=cls._text(row, "unit_rent"),
+                        layout=cls._text(row, "unit_layout"),
+                        area=cls._text(row, "unit_area"),
                         age_floors=age_floors,
                         unit_floor=unit_floor,
                     )
@@ -178,33 +353,73 @@ class SuumoScraper:
 
         return listings
 
-    def _extract_listing_id(self, href: str) -> Optional[str]:
+    @staticmethod
+    def _extract_listing_id(href: str) -> Optional[str]:
         """
         URLからユニークなIDを抽出する。
         - /chintai/jnc_000104425407/?bc=... → "jnc_000104425407"
         - フォールバック: bcパラメータを使用
         """
-        match = re.search(r"(jnc_\w+)", href)
+        match = _JNC_RE.search(href)
         if match:
-            return match.group(1)
+            return match.group(0)
 
         parsed = urlparse(href)
         qs = parse_qs(parsed.query)
         bc = qs.get("bc", [None])[0]
         return f"bc_{bc}" if bc else None
 
-    def _get_next_page_url(self, soup: BeautifulSoup) -> Optional[str]:
+    def _get_next_page_url(self, tree) -> Optional[str]:
         """「次へ」リンクのURLを取得する。なければNoneを返す。"""
-        for a in soup.select(SELECTORS["next_page"]):
-            text = a.get_text(strip=True)
+        for a in self._select(tree, "next_page"):
+            text = self._node_text(a)
             if "次へ" in text or text == ">":
-                href = a.get("href")
+                href = self._attr(a, "href")
                 if href:
-                    return urljoin(BASE_URL, str(href))
+                    return _absolute_url(href)
         return None
 
+    # --- HTMLパーサーの差異を吸収するヘルパー ---
+    # selectolax (C実装のDOM) を優先し、無い場合は lxml + コンパイル済みCSSSelector を使う。
+
+    @staticmethod
+    def _make_tree(html: Union[str, bytes]):
+        """HTMLをパースしてDOMツリーを返す。バイト列の場合は<meta charset>から文字コードを判定する。"""
+        if HTMLParser is not None:
+            return HTMLParser(html, encoding=True)
+        return lxml.html.fromstring(html)
+
+    @staticmethod
+    def _select(node, key: str) -> list:
+        """SELECTORS[key] に一致する子孫要素を全て返す。"""
+        if HTMLParser is not None:
+            return node.css(SELECTORS[key])
+        return _COMPILED_SELECTORS[key](node)
+
+    @staticmethod
+    def _select_one(node, key: str):
+        """SELECTORS[key] に一致する最初の子孫要素を返す。見つからない場合はNone。"""
+        if HTMLParser is not None:
+            return node.css_first(SELECTORS[key])
+        found = _COMPILED_SELECTORS[key](node)
+        return found[0] if found else None
+
+    @staticmethod
+    def _node_text(node, separator: str = "") -> str:
+        """要素内のテキストを前後の空白を除いて連結する。"""
+        if HTMLParser is not None:
+            return node.text(separator=separator, strip=True)
+        return separator.join(t.strip() for t in _TEXT_NODES(node) if t.strip())
+
     @staticmethod
-    def _text(element, selector: str) -> str:
+    def _attr(node, name: str) -> Optional[str]:
+        """要素の属性値を返す。"""
+        if HTMLParser is not None:
+            return node.attributes.get(name)
+        return node.get(name)
+
+    @classmethod
+    def _text(cls, element, key: str) -> str:
         """セレクターで要素を取得し、テキストを返す。見つからない場合は空文字列。"""
-        el = element.select_one(selector)
-        return el.get_text(strip=True) if el else ""
+        el = cls._select_one(element, key)
+        return cls._node_text(el) if el is not None else ""
@@ -26,6 +26,7 @@ storage.py - SQLiteを使って既知の物件IDを永続化し、新着を検
 
 import logging
 import sqlite3
+import threading
 from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
@@ -36,9 +37,14 @@ from .scraper import Listing
 logger = logging.getLogger(__name__)
 
 
-def _physical_key(listing: "Listing") -> str:
+def _physical_key(listing: "Listing") -> tuple[str, str, str, str]:
     """住所・階数・間取り・面積から物理的な部屋の同一性を判定するキーを生成する。"""
-    return f"{listing.address}|{listing.unit_floor}|{listing.layout}|{listing.area}"
+    return (listing.address, listing.unit_floor, listing.layout, listing.area)
+
+
+def _physical_key_str(listing: "Listing") -> str:
+    """DBの physical_key カラムに保存する文字列形式のキー。"""
+    return "|".join(_physical_key(listing))
 
 
 _SCHEMA = """
@@ -67,6 +73,19 @@ CREATE TABLE IF NOT EXISTS run_log (
 );
 """
 
+# 接続を開いたときに1回だけ設定する。
+# WAL + synchronous=NORMAL はDBの破損は防ぐが、電源断やOSクラッシュ時には直近のコミットが
+# 巻き戻ることがある (notified_at が失われると次回実行で重複通知になる)。
+# コミットごとのfsyncを省く代わりにこのリスクを受け入れている。
+_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+PRAGMA cache_size=-20000;
+PRAGMA foreign_keys=ON;
+"""
+
 
 class ListingStorage:
     """SUUMOの物件情報を管理するSQLiteストレージ。"""
@@ -74,22 +93,40 @@ class ListingStorage:
     def __init__(self, db_path: Union[str, Path]):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
         self._init_db()
 
+    def close(self) -> None:
+        """
+        キャッシュしている接続を閉じる。
+        閉じる前に PRAGMA optimize で、データ量が変わったテーブルの統計情報を必要に応じて更新する。
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.execute("PRAGMA optimize")
+                self._connection.close()
+                self._connection = None
+
     @contextmanager
     def _conn(self) -> Generator[sqlite3.Connection, None, None]:
-        conn = sqlite3.connect(str(self.db_path), timeout=10)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA foreign_keys=ON")
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        """
+        キャッシュした接続をロック付きで貸し出し、ブロック終了時にコミットする。
+        接続は初回のみ開き、PRAGMAもそのときに1回だけ発行する。
+        """
+        with self._lock:
+            if self._connection is None:
+                conn = sqlite3.connect(str(self.db_path), timeout=10, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.executescript(_PRAGMAS)
+                self._connection = conn
+            conn = self._connection
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
 
     def _init_db(self) -> None:
         with self._conn() as conn:
@@ -104,6 +141,16 @@ class ListingStorage:
                     conn.commit()
                 except sqlite3.OperationalError:
                     pass  # すでに存在する
+            # physical_key はマイグレーションで追加されるカラムなので、インデックスはその後に作る
+            # 階数が取れず空文字列の行は重複チェックに使わないので、部分インデックスで除外して小さく保つ
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_listings_pkey ON listings(physical_key) "
+                "WHERE physical_key != ''"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_listings_notified ON listings(notified_at) "
+                "WHERE notified_at IS NULL"
+            )
 
     def filter_new_listings(self, listings: list[Listing]) -> list[Listing]:
         """
@@ -114,44 +161,35 @@ class ListingStorage:
         if not listings:
             return []
 
-        ids = [l.listing_id for l in listings]
-        id_placeholders = ",".join("?" * len(ids))
-
-        # 階数が取れた物件のみphysical_keyで重複チェック
-        pkeys = [_physical_key(l) for l in listings if l.unit_floor]
-        pk_placeholders = ",".join("?" * len(pkeys)) if pkeys else None
+        # 階数が取れた物件のみphysical_keyで重複チェック (取れない物件は空文字列)
+        batch = [(l.listing_id, _physical_key_str(l) if l.unit_floor else "") for l in listings]
 
         with self._conn() as conn:
-            known_ids = {
+            # 接続は使い回すので、失敗時のロールバックで前回のテーブルが残っていても再利用できるようにする
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS t_batch (listing_id TEXT, physical_key TEXT)"
+            )
+            conn.execute("DELETE FROM temp.t_batch")
+            conn.executemany("INSERT INTO t_batch VALUES (?,?)", batch)
+            # 大半は既知の物件なので、新着のIDだけをSQLite側で絞り込んで受け取る
+            new_ids = {
                 row["listing_id"]
                 for row in conn.execute(
-                    f"SELECT listing_id FROM listings WHERE listing_id IN ({id_placeholders})",
-                    ids,
+                    """SELECT listing_id FROM t_batch b
+                       WHERE NOT EXISTS (
+                             SELECT 1 FROM listings l WHERE l.listing_id = b.listing_id)
+                         AND NOT (b.physical_key != '' AND EXISTS (
+                             SELECT 1 FROM listings l
+                             WHERE l.physical_key != '' AND l.physical_key = b.physical_key))"""
                 ).fetchall()
             }
-            known_pkeys: set[str] = set()
-            if pk_placeholders:
-                known_pkeys = {
-                    row["physical_key"]
-                    for row in conn.execute(
-                        f"SELECT physical_key FROM listings WHERE physical_key IN ({pk_placeholders})",
-                        pkeys,
-                    ).fetchall()
-                    if row["physical_key"]
-                }
-
-        def is_new(l: Listing) -> bool:
-            if l.listing_id in known_ids:
-                return False
-            if l.unit_floor and _physical_key(l) in known_pkeys:
-                return False
-            return True
+            conn.execute("DELETE FROM temp.t_batch")
 
         # DB重複 + バッチ内重複（同じ部屋を複数業者が掲載）を両方排除
-        seen_pkeys: set[str] = set()
+        seen_pkeys: set[tuple[str, str, str, str]] = set()
         result = []
         for l in listings:
-            if not is_new(l):
+            if l.listing_id not in new_ids:
                 continue
             if l.unit_floor:
                 pk = _physical_key(l)
@@ -177,12 +215,16 @@ class ListingStorage:
             )
         return cur.rowcount
 
-    def save_listings(self, listings: list[Listing]) -> None:
-        """新着物件をDBに保存する。INSERT OR IGNOREで冪等性を保証。"""
+    def save_listings(self, listings: list[Listing], notified: bool = False) -> None:
+        """
+        新着物件をDBに保存する。notified=True の場合は通知日時も同じINSERTで記録する。
+        既存レコードは通知日時のみ更新するので冪等。
+        """
         if not listings:
             return
 
         now = datetime.now(timezone.utc).isoformat()
+        notified_at = now if notified else None
         rows = [
             (
                 l.listing_id,
@@ -195,36 +237,26 @@ class ListingStorage:
                 l.area,
                 l.age_floors,
                 l.unit_floor,
-                _physical_key(l),
+                _physical_key_str(l),
                 now,
-                None,
+                notified_at,
             )
             for l in listings
         ]
 
         with self._conn() as conn:
             conn.executemany(
-                """INSERT OR IGNORE INTO listings
+                """INSERT INTO listings
                    (listing_id, url, building_name, address, station_access,
                     rent, layout, area, age_floors, unit_floor, physical_key,
                     first_seen_at, notified_at)
-                   VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                   VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+                   ON CONFLICT(listing_id) DO UPDATE
+                   SET notified_at = COALESCE(excluded.notified_at, listings.notified_at)""",
                 rows,
             )
         logger.info(f"{len(listings)} 件の物件をDBに保存しました。")
 
-    def mark_notified(self, listing_ids: list[str]) -> None:
-        """通知済みの物件に通知日時を記録する。"""
-        if not listing_ids:
-            return
-        now = datetime.now(timezone.utc).isoformat()
-        placeholders = ",".join("?" * len(listing_ids))
-        with self._conn() as conn:
-            conn.execute(
-                f"UPDATE listings SET notified_at=? WHERE listing_id IN ({placeholders})",
-                [now, *listing_ids],
-            )
-
     def log_run(
         self,
         listings_found: int,